@@ -2,34 +2,44 @@
 
 import numpy as np
 
-def generate_game_results(win_draw_probs, n=1):
+# Score for player 1 indexed by outcome code (0 = win, 1 = draw, 2 = loss)
+OUTCOME_SCORES = np.array([1, 0.5, 0])
+
+def generate_game_results(win_draw_probs, n=1, rng=None, out=None):
     """
     Vectorized generation of game results based on win/draw probabilities and multiplier n.
 
     :param win_draw_probs: A 2D array of shape (num_games, 2) with win and draw probabilities.
     :param n: Number of copies of game results.
-    :return: A 2D array of game results with shape (num_games, n).
+    :param rng: Optional numpy Generator; a freshly seeded one is used if not given.
+    :param out: Optional C-contiguous float32 buffer of shape (num_games, n) to reuse for the random draws.
+    :return: A 2D int8 array of outcome codes (see OUTCOME_SCORES) with shape (num_games, n).
     """
-    # Calculate lose probabilities
-    lose_probs = 1 - np.sum(win_draw_probs, axis=1)
+    # Work on C-contiguous float32 rows so each game's probabilities and draws are adjacent in memory
+    win_draw_probs = np.ascontiguousarray(win_draw_probs, dtype=np.float32)
 
-    # Expand the probabilities to match the output shape
-    outcome_probs = np.column_stack([win_draw_probs, lose_probs[:, np.newaxis]])  # Shape: (num_games, 3)
+    # Fill win, draw and lose probabilities into one preallocated (num_games, 3) array
+    outcome_probs = np.empty((len(win_draw_probs), 3), dtype=np.float32)
+    outcome_probs[:, :2] = win_draw_probs
+    outcome_probs[:, 2] = 1 - np.sum(win_draw_probs, axis=1)
 
     # Generate random numbers in the range [0, 1) for each outcome
-    random_nums = np.random.rand(len(win_draw_probs), n)
+    if rng is None:
+        rng = np.random.default_rng()
+    if out is None:
+        random_nums = rng.random((len(win_draw_probs), n), dtype=np.float32)
+    else:
+        random_nums = rng.random(dtype=np.float32, out=out)
 
     # Calculate cumulative probabilities to determine outcome thresholds
     cum_probs = np.cumsum(outcome_probs, axis=1)
 
-    # Determine outcomes based on where the random number falls in the cumulative probabilities
-    outcomes = np.sum(random_nums[:, :, np.newaxis] > cum_probs[:, np.newaxis, :], axis=2)
-
-    # Map numeric outcomes to W, D, L
-    outcome_map = np.array([1, 0.5, 0])
-    result = outcome_map[outcomes]
+    # Determine outcomes based on where the random number falls in the cumulative probabilities.
+    # With only three outcomes, two threshold comparisons are enough (0 = W, 1 = D, 2 = L).
+    outcomes = (random_nums > cum_probs[:, 0:1]).astype(np.int8, order='C')
+    outcomes += random_nums > cum_probs[:, 1:2]
 
-    return result
+    return outcomes
 
 def get_expected_score(eloDiff):
     """
@@ -57,9 +67,8 @@ def calculate_win_probability(rating1, rating2):
     :param rating2: Elo rating of player 2.
     :return: Win probability.
     """
-    diff = rating1 - rating2
-    expected_score = get_expected_score(diff)
-    return expected_score - 0.5 * calculate_draw_probability(rating1, rating2)
+    win_probability, _ = calculate_win_draw_probabilities(rating1, rating2)
+    return win_probability
 
 def calculate_draw_probability(rating1, rating2):
     """
@@ -69,28 +78,66 @@ def calculate_draw_probability(rating1, rating2):
     :param rating2: Elo rating of player 2.
     :return: Draw probability.
     """
-    diff = -1 * abs(rating1 - rating2)
+    _, draw_probability = calculate_win_draw_probabilities(rating1, rating2)
+    return draw_probability
+
+def calculate_win_draw_probabilities(rating1, rating2):
+    """
+    Calculate the win and draw probabilities together, sharing the power terms between them.
+
+    :param rating1: Elo rating of player 1.
+    :param rating2: Elo rating of player 2.
+    :return: Tuple of (win probability, draw probability).
+    """
+    diff = rating1 - rating2
     ave = (rating1 + rating2) / 2
-    expected_score = get_expected_score(diff)
     eloPerPawn = elo_per_pawn(ave)
     eloShift = eloPerPawn * 0.6
-    
-    win_probability = get_expected_score(diff - eloShift)
-    
+
+    # With q = 10^(|diff| / 400), the weaker player's expected score is E(-|diff|) = 1 / (1 + q)
+    # and their win probability is E(-|diff| - eloShift) = 1 / (1 + q * s), s = 10^(eloShift / 400).
+    q = 10 ** (np.abs(diff) / 400)
+    s = 10 ** (eloShift / 400)
+
     # Draw probability is calculated based on the difference between the expected score
     # and the win probability, considering that the expected score includes half the draw probability.
-    draw_probability = (expected_score - win_probability) * 2
-    return draw_probability
+    # 2 * (1 / (1 + q) - 1 / (1 + q * s)) over a common denominator:
+    draw_probability = 2 * q * (s - 1) / ((1 + q) * (1 + q * s))
+
+    # Player 1's expected score is q / (1 + q) if they are the higher rated player, else 1 / (1 + q)
+    expected_score = np.where(diff >= 0, q, 1) / (1 + q)
+    win_probability = expected_score - 0.5 * draw_probability
+    return win_probability, draw_probability
 
-def get_results(games, ratings, n=1):
+def get_probability_matrices(ratings):
+    """
+    Calculate win and draw probabilities for every pairing of players.
+
+    :param ratings: A 1D array of player ratings.
+    :return: Two 2D arrays of shape (num_players, num_players); entry [i, j] is the probability
+             of player i beating player j, and of the two drawing, respectively.
+    """
+    ratings = np.asarray(ratings, dtype=float)
+    rating1 = ratings[:, np.newaxis]
+    rating2 = ratings[np.newaxis, :]
+    return calculate_win_draw_probabilities(rating1, rating2)
+
+def get_results(games, ratings, n=1, rng=None):
     """
     Generate game results based on the ratings of players in a series of games.
     
-    :param games: A 2D array of shape (num_games, 2) with player ratings.
+    :param games: A 2D array of shape (num_games, 2) with player indices.
     :param ratings: A 1D array of player ratings.
     :param n: Number of copies of game results.
-    :return: A 2D array of game results with shape (num_games, n).
+    :param rng: Optional numpy Generator; a freshly seeded one is used if not given.
+    :return: A 2D int8 array of outcome codes (see OUTCOME_SCORES) with shape (num_games, n).
     """
-    win_draw_probs = np.array([[calculate_win_probability(ratings[game[0]], ratings[game[1]]),
-                                calculate_draw_probability(ratings[game[0]], ratings[game[1]])] for game in games])
-    return generate_game_results(win_draw_probs, n)
\ No newline at end of file
+    games = np.asarray(games)
+    ratings = np.asarray(ratings, dtype=float)
+    rating1 = ratings[games[:, 0]]
+    rating2 = ratings[games[:, 1]]
+
+    # The helpers are plain arithmetic, so they evaluate every game at once
+    win_probs, draw_probs = calculate_win_draw_probabilities(rating1, rating2)
+    win_draw_probs = np.stack([win_probs, draw_probs], axis=1)
+    return generate_game_results(win_draw_probs, n, rng)
\ No newline at end of file
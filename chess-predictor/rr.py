@@ -1,79 +1,254 @@
 # For round robin tournaments
 
-from chess import get_results
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+from chess import OUTCOME_SCORES, generate_game_results, get_probability_matrices
+
+# Simulations are generated and tallied this many at a time so the working set stays in cache
+SIMULATION_CHUNK_SIZE = 16384
+
+def tally_wins(id1, id2, simulated_results, baseline, scores=None):
+    """
+    Tally tournament wins per player over a batch of simulated tournaments.
+
+    :param id1: A 1D array of player 1 ids for the simulated games.
+    :param id2: A 1D array of player 2 ids for the simulated games.
+    :param simulated_results: A 2D array of outcome codes with shape (num_games, n).
+    :param baseline: A 1D array of each player's score from completed games.
+    :param scores: Optional float scratch array of shape (num_players, n) for the NumPy tally to reuse.
+    :return: A 1D array of tournament wins per player; tied winners share a win equally.
+    """
+    if numba is not None:
+        # The kernel walks each game's row of results, so keep rows contiguous
+        simulated_results = np.ascontiguousarray(simulated_results)
+        # Scores are tallied in half points so ties compare exactly as integers
+        baseline = np.rint(2 * baseline).astype(np.int32)
+        num_blocks = min(simulated_results.shape[1], 4 * numba.get_num_threads())
+        return _tally_wins_numba(id1, id2, simulated_results, baseline, num_blocks)
+
+    simulated_scores = OUTCOME_SCORES[simulated_results]
+
+    # Score matrix of shape (num_players, n): completed games are tallied once
+    # and copied to every simulation before adding the simulated games
+    if scores is None:
+        scores = np.empty((len(baseline), simulated_results.shape[1]))
+    np.copyto(scores, baseline[:, np.newaxis])
+    np.add.at(scores, id1, simulated_scores)
+    np.add.at(scores, id2, 1 - simulated_scores)
+
+    # Tied winners share the title equally in each simulation
+    winners_mask = scores == scores.max(axis=0, keepdims=True)
+    wins = winners_mask @ (1 / winners_mask.sum(axis=0))
+    return wins
+
+if numba is not None:
+    @numba.njit(parallel=True, fastmath=True, cache=True)
+    def _tally_wins_numba(id1, id2, simulated_results, baseline, num_blocks):
+        num_players = baseline.shape[0]
+        num_games, n = simulated_results.shape
+        # Each block of simulations is tallied into its own row, so parallel blocks never
+        # write to the same memory
+        block_wins = np.zeros((num_blocks, num_players))
+        for block in numba.prange(num_blocks):
+            start = block * n // num_blocks
+            end = (block + 1) * n // num_blocks
+            scores = np.empty((num_players, end - start), dtype=np.int32)
+            for player in range(num_players):
+                scores[player, :] = baseline[player]
+            # Walk each game's row of results contiguously; outcome code c gives
+            # player 1 2 - c half points and player 2 c half points
+            for game in range(num_games):
+                player1 = id1[game]
+                player2 = id2[game]
+                for i in range(end - start):
+                    code = simulated_results[game, start + i]
+                    scores[player1, i] += 2 - code
+                    scores[player2, i] += code
+            for i in range(end - start):
+                max_score = scores[0, i]
+                for player in range(1, num_players):
+                    max_score = max(max_score, scores[player, i])
+                num_winners = 0
+                for player in range(num_players):
+                    if scores[player, i] == max_score:
+                        num_winners += 1
+                for player in range(num_players):
+                    if scores[player, i] == max_score:
+                        block_wins[block, player] += 1 / num_winners
+        return block_wins.sum(axis=0)
+
+def _init_worker():
+    """
+    Limit each simulation worker process to one Numba thread, since the processes already run in parallel.
+    """
+    if numba is not None:
+        numba.set_num_threads(1)
 
 class RoundRobinTournament:
 
-    def __init__(self, names, ratings, n_games=1):
+    def __init__(self, names, ratings, n_games=1, seed=None):
         self.names = names
         self.ratings = ratings
         self.n_games = n_games
-        self.completed_games = {}
+        self.rng = np.random.default_rng(seed)
+        # Completed games as parallel arrays; player 1 always has the lower id and
+        # results are player 1's score
+        self.p1_ids = np.empty(0, dtype=np.int32)
+        self.p2_ids = np.empty(0, dtype=np.int32)
+        self.results = np.empty(0, dtype=np.float32)
+        # Pairwise win/draw probabilities, shared by every simulated game between the same players
+        self.win_probs, self.draw_probs = get_probability_matrices(ratings)
 
     def add_games(self, games):
+        games_played = self.count_games()
+        p1_ids, p2_ids, results = [], [], []
         for game in games:
             id1, id2, result = game
             pair = (id1, id2) if id1 < id2 else (id2, id1)
             result = result if id1 < id2 else 1 - result
-            if pair not in self.completed_games:
-                self.completed_games[pair] = []
-            if len(self.completed_games[pair]) < self.n_games:
-                self.completed_games[pair].append(result)
+            if games_played[pair] < self.n_games:
+                games_played[pair] += 1
+                p1_ids.append(pair[0])
+                p2_ids.append(pair[1])
+                results.append(result)
+
+        self.p1_ids = np.concatenate([self.p1_ids, np.array(p1_ids, dtype=np.int32)])
+        self.p2_ids = np.concatenate([self.p2_ids, np.array(p2_ids, dtype=np.int32)])
+        self.results = np.concatenate([self.results, np.array(results, dtype=np.float32)])
+
+    def count_games(self):
+        """
+        Count the completed games between each pair of players as a (num_players, num_players) array.
+        """
+        games_played = np.zeros((len(self.names), len(self.names)), dtype=int)
+        np.add.at(games_played, (self.p1_ids, self.p2_ids), 1)
+        return games_played
 
-    def calculate_standings(self, completed_games=None):
+    def calculate_scores(self):
+        """
+        Calculate each player's score from completed games as an array indexed by player id.
+        """
+        # Start from a float array: bincount returns integers when no games have been played
+        num_players = len(self.names)
+        scores = np.zeros(num_players)
+        scores += np.bincount(self.p1_ids, weights=self.results, minlength=num_players)
+        scores += np.bincount(self.p2_ids, weights=1 - self.results, minlength=num_players)
+        return scores
+
+    def calculate_standings(self):
         """
         Calculate the current standings based on completed games.
         """
-        if completed_games is None:
-            completed_games = self.completed_games
-    
-        standings = {name: 0 for name in self.names}
-        for game, results in completed_games.items():
-            for result in results:
-                standings[self.names[game[0]]] += result
-                standings[self.names[game[1]]] += 1 - result
+        scores = self.calculate_scores()
+        standings = {name: float(scores[i]) for i, name in enumerate(self.names)}
         return standings
     
-    def get_winners(self, completed_games=None):
+    def get_winners(self):
         """
         Get the winners of the tournament based on the current standings.
         """
-        standings = self.calculate_standings(completed_games)
-        max_score = max(standings.values())
-        winners = [name for name, score in standings.items() if score == max_score]
+        scores = self.calculate_scores()
+        winner_ids = np.flatnonzero(scores == scores.max())
+        winners = [self.names[i] for i in winner_ids]
         return winners
 
-    def get_odds(self, n=1):
-        games_to_play = []
-        for id1 in range(len(self.names)):
-            for id2 in range(id1 + 1, len(self.names)):
-                pair = (id1, id2)
-                if pair not in self.completed_games:
-                    games_to_play.extend([pair] * self.n_games)
-                elif len(self.completed_games[pair]) < self.n_games:
-                    games_to_play.extend([pair] * (self.n_games - len(self.completed_games[pair])))
-
-        if not games_to_play:
+    def get_odds(self, n=1, n_jobs=1):
+        """
+        Estimate each player's odds of winning the tournament by simulating the remaining games.
+
+        :param n: Number of simulated tournaments.
+        :param n_jobs: Number of worker processes to split the simulations across (-1 for all CPUs).
+        :return: A dictionary mapping player names to their odds of winning.
+        """
+        # Every pair meets n_games times; repeat each pair once per game still to be played
+        games_remaining = self.n_games - self.count_games()
+        id1, id2 = np.triu_indices(len(self.names), k=1)
+        games_remaining = games_remaining[id1, id2]
+        id1 = np.repeat(id1, games_remaining)
+        id2 = np.repeat(id2, games_remaining)
+
+        # A player who cannot reach the leader's current score even by winning every remaining
+        # game is eliminated and never wins a simulation. Games between two eliminated players
+        # cannot change the winner, so they are not simulated.
+        num_players = len(self.names)
+        scores = self.calculate_scores()
+        max_scores = scores + np.bincount(id1, minlength=num_players) + np.bincount(id2, minlength=num_players)
+        contenders = max_scores >= scores.max()
+        if np.count_nonzero(contenders) == 1:
+            return {name: float(contenders[i]) for i, name in enumerate(self.names)}
+        undecided = contenders[id1] | contenders[id2]
+        id1, id2 = id1[undecided], id2[undecided]
+
+        # Nothing left to decide the winner: the current leaders share the title without simulating
+        if len(id1) == 0:
             winners = self.get_winners()
-            return {winner: 1 for winner in winners} + {name: 0 for name in self.names if name not in winners}
-        
-        simulated_results = get_results(games_to_play, self.ratings, n)
-        # Initialize odds dictionary
-        odds = {name: 0 for name in self.names}
-
-        for i in range(n):
-            temp_completed_games = {k: [res for res in v] for k, v in self.completed_games.items()}
-            for j, game in enumerate(games_to_play):
-                result = simulated_results[j][i]
-                temp_completed_games.setdefault(game, []).append(result)
-            standings = self.calculate_standings(temp_completed_games)
-            max_score = max(standings.values())
-            winners = [name for name, score in standings.items() if score == max_score]
+            odds = {name: 0.0 for name in self.names}
             for winner in winners:
-                odds[winner] += 1 / n
-    
+                odds[winner] = 1.0 / len(winners)
+            return odds
+
+        # No simulations to run, so no player has been credited a win
+        if n < 1:
+            return {name: 0.0 for name in self.names}
+
+        if n_jobs == -1:
+            n_jobs = os.cpu_count()
+        n_jobs = max(1, min(n_jobs, n))
+
+        if n_jobs == 1:
+            wins = self.simulate_wins(id1, id2, n, self.rng)
+        else:
+            # Simulations are independent, so each worker runs a share of them and the
+            # win tallies are summed. Workers get independent child generators of self.rng.
+            # Workers are spawned rather than forked because Numba's thread pool is not fork-safe.
+            chunk_sizes = np.full(n_jobs, n // n_jobs)
+            chunk_sizes[:n % n_jobs] += 1
+            with ProcessPoolExecutor(max_workers=n_jobs, mp_context=multiprocessing.get_context("spawn"),
+                                     initializer=_init_worker) as executor:
+                futures = [executor.submit(self.simulate_wins, id1, id2, int(chunk_size), rng)
+                           for chunk_size, rng in zip(chunk_sizes, self.rng.spawn(n_jobs))]
+                wins = sum(future.result() for future in futures)
+
+        win_odds = wins / n
+        odds = {name: float(win_odds[i]) for i, name in enumerate(self.names)}
         return odds
 
+    def simulate_wins(self, id1, id2, n, rng):
+        """
+        Simulate the remaining games n times and tally tournament wins per player.
+
+        :param id1: A 1D array of player 1 ids for the games to play.
+        :param id2: A 1D array of player 2 ids for the games to play.
+        :param n: Number of simulated tournaments.
+        :param rng: numpy Generator to draw the game results from.
+        :return: A 1D array of tournament wins per player; tied winners share a win equally.
+        """
+        win_draw_probs = np.stack([self.win_probs[id1, id2], self.draw_probs[id1, id2]], axis=1)
+        baseline = self.calculate_scores()
+
+        # Draw and tally one chunk of simulations at a time, reusing the random number
+        # and score buffers between chunks
+        wins = np.zeros(len(self.names))
+        random_nums = np.empty((len(id1), min(n, SIMULATION_CHUNK_SIZE)), dtype=np.float32)
+        scores = np.empty((len(self.names), random_nums.shape[1]))
+        for start in range(0, n, SIMULATION_CHUNK_SIZE):
+            chunk_size = min(SIMULATION_CHUNK_SIZE, n - start)
+            if chunk_size < random_nums.shape[1]:
+                random_nums = np.empty((len(id1), chunk_size), dtype=np.float32)
+                scores = scores[:, :chunk_size]
+            simulated_results = generate_game_results(win_draw_probs, chunk_size, rng, out=random_nums)
+            wins += tally_wins(id1, id2, simulated_results, baseline, scores)
+        return wins
+
 def import_rr_tournament(filename):
     """
     Import the results of a round-robin chess tournament from a CSV file.
@@ -82,27 +257,29 @@ def import_rr_tournament(filename):
     :return: A 2D array of game results with shape (num_games, n).
     """
 
-    lines = open(filename).readlines()
+    with open(filename) as f:
+        lines = f.readlines()
     n_games = int(lines[0].strip())
     # First line contains player names.
     player_names = lines[1].strip().split(',')
+    player_ids = {name: i for i, name in enumerate(player_names)}
     # Second line is ratings
     player_ratings = lines[2].strip().split(',')
     player_ratings = [float(rating) for rating in player_ratings]
     # Remaining lines are game outcomes
     # Format is player1_name,player2_name,result
-    game_results = open(filename).readlines()[3:]
+    game_results = lines[3:]
     games = []
     for result in game_results:
         player1, player2, outcome = result.strip().split(',')
-        games.append((player_names.index(player1), player_names.index(player2), float(outcome)))
+        games.append((player_ids[player1], player_ids[player2], float(outcome)))
     tournament = RoundRobinTournament(player_names, player_ratings, n_games)
     tournament.add_games(games)
     return tournament
 
 def main():
     tournament = import_rr_tournament('candidates2024.txt')
-    odds = tournament.get_odds(1000000)
+    odds = tournament.get_odds(1000000, n_jobs=-1)
     print(odds)
 
 if __name__ == '__main__':
@@ -2,6 +2,64 @@ import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 import os
+import functools
+
+@functools.lru_cache(maxsize=None)
+def load_stock(stock):
+    """
+    Reads and preprocesses the price history of a stock, caching it for reuse across portfolios.
+
+    Parameters:
+        stock (str): The stock name. Prices are read from "<stock>.csv", or from "btc.csv" and "btc2.csv" for "btc".
+
+    Returns:
+        DataFrame: Daily average prices indexed by date, in a single column named after the stock.
+                   The cached DataFrame is shared between calls and should not be modified.
+    """
+    if stock.lower() == "btc":
+        # Read and preprocess btc.csv
+        btc_df1 = pd.read_csv("btc.csv")
+        btc_df1['Date'] = pd.to_datetime(btc_df1['Date'])
+        btc_df1 = btc_df1.sort_values(by='Date')
+
+        # Remove commas and convert to float
+        btc_df1['Price'] = btc_df1['Price'].str.replace(',', '').astype(float)
+        btc_df1['Open'] = btc_df1['Open'].str.replace(',', '').astype(float)
+        btc_df1['Average Price'] = (btc_df1['Price'] + btc_df1['Open']) / 2
+
+        # Read and preprocess btc2.csv
+        btc_df2 = pd.read_csv("btc2.csv")
+        btc_df2['Date'] = pd.to_datetime(btc_df2['Date'])
+        btc_df2 = btc_df2.sort_values(by='Date')
+
+        # Remove commas and convert to float for 'Open' and 'Close/Last'
+        btc_df2['Open'] = btc_df2['Open'].astype(str).str.replace(',', '').astype(float)
+        btc_df2['Close/Last'] = btc_df2['Close/Last'].astype(str).str.replace(',', '').astype(float)
+        btc_df2['Average Price'] = (btc_df2['Open'] + btc_df2['Close/Last']) / 2
+
+        # Concatenate and remove overlapping dates
+        btc_combined = pd.concat([btc_df1, btc_df2])
+        btc_combined = btc_combined.drop_duplicates(subset='Date', keep='last')
+
+        return btc_combined.set_index('Date')[['Average Price']].rename(columns={'Average Price': stock})
+
+    filename = f"{stock}.csv"
+    if not os.path.exists(filename):
+        raise FileNotFoundError(f"Stock file '{filename}' does not exist.")
+
+    df = pd.read_csv(filename)
+    df['Date'] = pd.to_datetime(df['Date'])
+    df = df.sort_values(by='Date')  # Ensure dates are in ascending order
+
+    # Remove commas and dollar signs in one pass and convert to float for relevant columns
+    if 'Close/Last' in df.columns and 'Open' in df.columns:
+        df['Open'] = df['Open'].astype(str).str.replace(r'[$,]', '', regex=True).astype(float)
+        df['Close/Last'] = df['Close/Last'].astype(str).str.replace(r'[$,]', '', regex=True).astype(float)
+        df['Average Price'] = (df['Open'] + df['Close/Last']) / 2
+    else:
+        raise ValueError(f"Unrecognized format for file {stock}")
+
+    return df.set_index('Date')[['Average Price']].rename(columns={'Average Price': stock})
 
 def compute_portfolio_returns(portfolios, portfolio_names=None, start_date=None):
     """
@@ -23,52 +81,7 @@ def compute_portfolio_returns(portfolios, portfolio_names=None, start_date=None)
 
     for portfolio_index, portfolio in enumerate(portfolios):
         # Read data and preprocess
-        stock_data = {}
-        for stock, weight in portfolio.items():
-            if stock.lower() == "btc":
-                # Read and preprocess btc.csv
-                btc_df1 = pd.read_csv("btc.csv")
-                btc_df1['Date'] = pd.to_datetime(btc_df1['Date'])
-                btc_df1 = btc_df1.sort_values(by='Date')
-
-                # Remove commas and convert to float
-                btc_df1['Price'] = btc_df1['Price'].str.replace(',', '').astype(float)
-                btc_df1['Open'] = btc_df1['Open'].str.replace(',', '').astype(float)
-                btc_df1['Average Price'] = (btc_df1['Price'] + btc_df1['Open']) / 2
-
-                # Read and preprocess btc2.csv
-                btc_df2 = pd.read_csv("btc2.csv")
-                btc_df2['Date'] = pd.to_datetime(btc_df2['Date'])
-                btc_df2 = btc_df2.sort_values(by='Date')
-
-                # Remove commas and convert to float for 'Open' and 'Close/Last'
-                btc_df2['Open'] = btc_df2['Open'].astype(str).str.replace(',', '').astype(float)
-                btc_df2['Close/Last'] = btc_df2['Close/Last'].astype(str).str.replace(',', '').astype(float)
-                btc_df2['Average Price'] = (btc_df2['Open'] + btc_df2['Close/Last']) / 2
-
-                # Concatenate and remove overlapping dates
-                btc_combined = pd.concat([btc_df1, btc_df2])
-                btc_combined = btc_combined.drop_duplicates(subset='Date', keep='last')
-
-                stock_data[stock] = btc_combined.set_index('Date')[['Average Price']].rename(columns={'Average Price': stock})
-            else:
-                filename = f"{stock}.csv"
-                if not os.path.exists(filename):
-                    raise FileNotFoundError(f"Stock file '{filename}' does not exist.")
-
-                df = pd.read_csv(filename)
-                df['Date'] = pd.to_datetime(df['Date'])
-                df = df.sort_values(by='Date')  # Ensure dates are in ascending order
-
-                # Remove commas and convert to float for relevant columns
-                if 'Close/Last' in df.columns and 'Open' in df.columns:
-                    df['Open'] = df['Open'].astype(str).str.replace(',', '').str.replace('$', '').astype(float)
-                    df['Close/Last'] = df['Close/Last'].astype(str).str.replace(',', '').str.replace('$', '').astype(float)
-                    df['Average Price'] = (df['Open'] + df['Close/Last']) / 2
-                else:
-                    raise ValueError(f"Unrecognized format for file {stock}")
-
-                stock_data[stock] = df.set_index('Date')[['Average Price']].rename(columns={'Average Price': stock})
+        stock_data = {stock: load_stock(stock) for stock in portfolio}
 
         # Combine data into a single DataFrame using outer join to include all dates
         combined_data = pd.concat(stock_data.values(), axis=1, join='outer').sort_index()
@@ -84,50 +97,23 @@ def compute_portfolio_returns(portfolios, portfolio_names=None, start_date=None)
             start_date = pd.to_datetime(start_date)
             combined_data = combined_data[combined_data.index >= start_date]
 
-        # Initialize DataFrames to track holdings and portfolio value
-        holdings = pd.DataFrame(0.0, index=combined_data.index, columns=combined_data.columns.tolist() + ['Cash'])
-        portfolio_value = pd.Series(0.0, index=combined_data.index)
-        cumulative_invested = pd.Series(0.0, index=combined_data.index)
-
-        # Initialize cumulative investment
-        total_invested = 0.0
-
-        # Iterate over each day to simulate daily investments
-        for i, date in enumerate(combined_data.index):
-            daily_investment = 1.0  # $1 invested each day
-            total_invested += daily_investment
-            cumulative_invested.at[date] = total_invested
-
-            for stock, weight in portfolio.items():
-                investment_amount = daily_investment * weight
-                price = combined_data.at[date, stock]
-                shares_bought = investment_amount / price
-                if i == 0:
-                    holdings.at[date, stock] = shares_bought
-                else:
-                    holdings.at[date, stock] = holdings.iloc[i - 1][stock] + shares_bought
-
-            # For cash holdings (if any)
-            cash_weight = 1.0 - sum(portfolio.values())
-            if cash_weight > 0:
-                cash_investment = daily_investment * cash_weight
-                if i == 0:
-                    holdings.at[date, 'Cash'] = cash_investment
-                else:
-                    holdings.at[date, 'Cash'] = holdings.iloc[i - 1]['Cash'] + cash_investment
-
-        # Calculate portfolio value each day
-        for date in combined_data.index:
-            current_holdings = holdings.loc[date]
-            current_prices = combined_data.loc[date]
-            # Calculate value from stocks
-            value = 0.0
-            for stock in portfolio.keys():
-                value += current_holdings[stock] * current_prices[stock]
-            # Add cash
-            if 'Cash' in current_holdings:
-                value += current_holdings['Cash']
-            portfolio_value.at[date] = value
+        # $1 is invested each day, split across stocks by weight with the remainder held in cash.
+        # Holdings on each day are the running total of shares bought (and cash added) so far.
+        daily_investment = 1.0
+        stocks = list(portfolio.keys())
+        # Prices as a C-contiguous float32 (days, stocks) matrix; pandas is only used again for plotting
+        prices = np.ascontiguousarray(combined_data[stocks].to_numpy(dtype=np.float32))
+        weights = np.array([portfolio[stock] for stock in stocks], dtype=np.float32)
+        days = np.arange(1, len(combined_data) + 1)
+
+        cumulative_invested = pd.Series(daily_investment * days, index=combined_data.index, dtype=float)
+        holdings = np.cumsum(daily_investment * weights / prices, axis=0)
+        cash_weight = 1.0 - sum(portfolio.values())
+        cash_holdings = daily_investment * max(cash_weight, 0.0) * days
+
+        # Calculate portfolio value each day: the row-wise dot product of holdings and prices, plus cash
+        stock_value = np.einsum('ds,ds->d', holdings, prices)
+        portfolio_value = pd.Series(stock_value + cash_holdings, index=combined_data.index)
 
         # Calculate normalized return: portfolio value divided by cumulative invested up to that day
         normalized_return = portfolio_value / cumulative_invested